@@ -8,13 +8,25 @@ import time
 import tempfile
 import json
 import os
+import glob
 import struct
-import codecs
 import subprocess
 import shlex
 
+from collections import namedtuple
+
 from cart_utils import CartTest
 
+# Key fields are little-endian 32-bit integers; parse the format once
+_U32_LE = struct.Struct("<I")
+
+# Compact action record; fields an operation does not use stay None
+Action = namedtuple(
+    'Action',
+    ['operation', 'rank', 'key', 'value', 'sync', 'return_code',
+     'expected_value', 'version', 'time'])
+Action.__new__.__defaults__ = (None,) * 6
+
 
 def _check_value(expected_value, received_value):
     """
@@ -24,28 +36,17 @@ def _check_value(expected_value, received_value):
 
         returns True if the values match, False otherwise
     """
-    char = None
-    # Comparisons are lower case
-    received_value = received_value.lower()
-
-    # Convert the expected value to hex characters
-    expected_value_hex = "".join(
-        "{:02x}".format(ord(c)) for c in expected_value).lower()
-
-    # Make sure received value is at least as long as expected
-    if len(received_value) < len(expected_value_hex):
-        return False
-
-    # Make sure received value starts with the expected value
-    if expected_value_hex not in received_value[:len(expected_value_hex)]:
+    try:
+        received = bytes.fromhex(received_value)
+    except ValueError:
         return False
 
-    # Make sure all characters after the expected value are zeros (if any)
-    for char in received_value[len(expected_value_hex):]:
-        if char != "0":
-            return False
+    expected = expected_value.encode('latin-1')
 
-    return True
+    # The received value must start with the expected value and any
+    # remaining bytes must be zeros
+    return (received.startswith(expected) and
+            not received[len(expected):].lstrip(b'\x00'))
 
 
 def _check_key(key_rank, key_idx, received_key_hex):
@@ -57,14 +58,18 @@ def _check_key(key_rank, key_idx, received_key_hex):
     if len(received_key_hex) != 16:
         return False
 
-    rank = struct.unpack("<I",
-                         codecs.decode(received_key_hex[:8], "hex"))[0]
-    idx = struct.unpack("<I",
-                        codecs.decode(received_key_hex[8:], "hex"))[0]
+    raw = bytes.fromhex(received_key_hex)
+    rank = _U32_LE.unpack_from(raw, 0)[0]
+    idx = _U32_LE.unpack_from(raw, 4)[0]
 
     return (rank == key_rank) and (idx == key_idx)
 
 
+def _key_arg(action):
+    """Format the action key as the rank:idx argument for iv_client."""
+    return f"{int(action.key[0])}:{int(action.key[1])}"
+
+
 class CartIvTwoNodeTest(CartTest):
     # pylint: disable=too-few-public-methods
     """Run basic CaRT tests on one-node.
@@ -72,120 +77,151 @@ class CartIvTwoNodeTest(CartTest):
     :avocado: recursive
     """
 
+    def setUp(self):
+        """Set up the cart iv test."""
+        super().setUp()
+
+        # Create a unique temporary file in the directory shared with the
+        # client hosts; the batch file handed to iv_client and the
+        # per-fetch result files all derive from its path.
+        log_path_dir = (os.environ.get('DAOS_TEST_SHARED_DIR')
+                        or os.environ['HOME'])
+
+        batch_fd, self._batch_path = tempfile.mkstemp(dir=log_path_dir)
+        os.close(batch_fd)
+
+    def tearDown(self):
+        """Tear down the cart iv test."""
+        os.remove(self._batch_path)
+        for log_path in glob.glob(self._batch_path + '.fetch_*'):
+            os.remove(log_path)
+        super().tearDown()
+
     def _verify_action(self, action):
         """Verify the action."""
-        if (('operation' not in action) or
-                ('rank' not in action) or
-                ('key' not in action)):
+        if (action.operation is None or
+                action.rank is None or
+                action.key is None):
             self.print("Error happened during action check")
             raise ValueError(
                 "Each action must contain an operation, rank, and key")
 
-        if len(action['key']) != 2:
+        if len(action.key) != 2:
             self.print("Error key should be tuple of (rank, idx)")
             raise ValueError("key should be a tuple of (rank, idx)")
 
     def _verify_fetch_operation(self, action):
         """Verify fetch operation."""
-        if (('return_code' not in action) or
-                ('expected_value' not in action)):
+        if (action.return_code is None or
+                action.expected_value is None):
             self.print("Error: fetch operation was malformed")
             raise ValueError("Fetch operation malformed")
 
-    def _iv_test_actions(self, cmd, actions):
-        # pylint: disable=too-many-locals
-        """Go through each action and perform the test."""
-        for action in actions:
-            clicmd = cmd
-            command = 'tests/iv_client'
+    def _fetch_log_path(self, index):
+        """Path of the result file for the fetch action at this index."""
+        return f"{self._batch_path}.fetch_{index}"
 
-            self._verify_action(action)
+    def _build_fetch_argv(self, action, index):
+        """Build the operation-specific iv_client arguments for a fetch."""
+        # Each fetch gets its own result file so that the results can be
+        # verified per action once the whole batch has run
+        return ['-k', _key_arg(action), '-l', self._fetch_log_path(index)]
+
+    def _build_update_argv(self, action, _index):
+        """Build the operation-specific iv_client arguments for an update."""
+        if action.value is None:
+            raise ValueError("Update operation requires value")
 
-            operation = action['operation']
-            rank = int(action['rank'])
-            key_rank = int(action['key'][0])
-            key_idx = int(action['key'][1])
+        return ['-k', _key_arg(action), '-v', str(action.value)]
 
-            if "fetch" in operation:
+    def _build_invalidate_argv(self, action, _index):
+        """Build the operation-specific iv_client arguments for invalidate."""
+        return ['-k', _key_arg(action)]
+
+    # Map each operation to the builder for its iv_client arguments
+    _ARGV_BUILDERS = {
+        'fetch': _build_fetch_argv,
+        'update': _build_update_argv,
+        'invalidate': _build_invalidate_argv,
+    }
+
+    def _validate_actions(self, actions):
+        """Validate every action before any client processes are launched.
+
+        Catching a malformed action up front avoids paying for the client
+        runs that precede it in the list.
+        """
+        for action in actions:
+            self._verify_action(action)
+            if action.operation not in self._ARGV_BUILDERS:
+                raise ValueError(f"Unknown operation '{action.operation}'")
+            if action.operation == 'fetch':
                 self._verify_fetch_operation(action)
-                expected_rc = int(action['return_code'])
-
-                # Create a temporary file for iv_client to write the results to
-                log_path_dir = os.environ['HOME']
-                if os.environ['DAOS_TEST_SHARED_DIR']:
-                    log_path_dir = os.environ['DAOS_TEST_SHARED_DIR']
-
-                log_fd, log_path = tempfile.mkstemp(dir=log_path_dir)
-
-                command = " {!s} -o '{!s}' -r '{!s}' -k '{!s}:{!s}' -l '{!s}'" \
-                    .format(command, operation, rank, key_rank, key_idx,
-                            log_path)
-                clicmd += command
-
-                self.print("\nClient cmd : %s\n" % clicmd)
-                cli_rtn = subprocess.call(shlex.split(clicmd))
-
-                if cli_rtn != 0:
-                    raise ValueError(
-                        'Error code {!s} running command "{!s}"'.format(
-                            cli_rtn, command))
-
-                # Read the result into test_result and remove the temp file
-                log_file = open(log_path)
-                test_result = json.load(log_file)
-                log_file.close()
-                os.close(log_fd)
-                os.remove(log_path)
-
-                # Parse return code and make sure it matches
-                if expected_rc != test_result["return_code"]:
-                    raise ValueError(
-                        "Fetch returned return code {!s} != expected value "
-                        "{!s}".format(test_result["return_code"], expected_rc))
-
-                # Other values will be invalid if return code is failure
-                if expected_rc != 0:
-                    continue
-
-                # Check that returned key matches expected one
-                if not _check_key(key_rank, key_idx, test_result["key"]):
-                    raise ValueError("Fetch returned unexpected key")
-
-                # Check that returned value matches expected one
-                if not _check_value(action['expected_value'],
-                                    test_result["value"]):
-                    raise ValueError("Fetch returned unexpected value")
-
-            if "update" in operation:
-                if 'value' not in action:
-                    raise ValueError("Update operation requires value")
-
-                command = \
-                    " {!s} -o '{!s}' -r '{!s}' -k '{!s}:{!s}' -v '{!s}'".format(
-                        command, operation, rank, key_rank, key_idx,
-                        action['value'])
-                clicmd += command
-
-                self.print("\nClient cmd : %s\n" % clicmd)
-                cli_rtn = subprocess.call(shlex.split(clicmd))
-
-                if cli_rtn != 0:
-                    raise ValueError(
-                        'Error code {!s} running command "{!s}"'.format(
-                            cli_rtn, command))
-
-            if "invalidate" in operation:
-                command = " {!s} -o '{!s}' -r '{!s}' -k '{!s}:{!s}'".format(
-                    command, operation, rank, key_rank, key_idx)
-                clicmd += command
-
-                self.print("\nClient cmd : %s\n" % clicmd)
-                cli_rtn = subprocess.call(shlex.split(clicmd))
-
-                if cli_rtn != 0:
-                    raise ValueError(
-                        'Error code {!s} running command "{!s}"'.format(
-                            cli_rtn, command))
+
+    def _verify_fetch_result(self, action, index):
+        """Verify the result written by iv_client for a fetch action."""
+        # The result file was written on the client host; open it
+        # fresh now that the batch run is over so a shared filesystem
+        # cannot serve stale cached data
+        with open(self._fetch_log_path(index), 'rb') as log_file:
+            test_result = json.load(log_file)
+
+        # Parse return code and make sure it matches
+        expected_rc = int(action.return_code)
+        if expected_rc != test_result["return_code"]:
+            raise ValueError(
+                f"Fetch {index} returned return code "
+                f"{test_result['return_code']} != expected value "
+                f"{expected_rc}")
+
+        # Other values will be invalid if return code is failure
+        if expected_rc != 0:
+            return
+
+        # Check that returned key matches expected one
+        if not _check_key(int(action.key[0]), int(action.key[1]),
+                          test_result["key"]):
+            raise ValueError(f"Fetch {index} returned unexpected key")
+
+        # Check that returned value matches expected one
+        if not _check_value(action.expected_value, test_result["value"]):
+            raise ValueError(f"Fetch {index} returned unexpected value")
+
+    def _iv_test_actions(self, client_argv, actions):
+        """Run every action through one batched iv_client invocation.
+
+        Args:
+            client_argv (list): tokenized client launcher command
+            actions (list): Action records to run
+        """
+        self._validate_actions(actions)
+
+        # One whitespace-separated batch line per action; iv_client -b
+        # runs them in order within a single client process
+        batch_lines = []
+        for index, action in enumerate(actions):
+            argv = ['-o', action.operation, '-r', str(int(action.rank))]
+            argv += self._ARGV_BUILDERS[action.operation](self, action,
+                                                          index)
+            batch_lines.append(' '.join(argv))
+
+        with open(self._batch_path, 'w') as batch_file:
+            batch_file.write('\n'.join(batch_lines) + '\n')
+
+        argv = client_argv + ['tests/iv_client', '-b', self._batch_path]
+        self.print(f"\nClient cmd : {' '.join(argv)}\n")
+        self.print("Batch actions :\n{}\n".format('\n'.join(batch_lines)))
+        cli_rtn = subprocess.call(argv)
+
+        if cli_rtn != 0:
+            raise ValueError(
+                f'Error code {cli_rtn} running command '
+                f'"{" ".join(argv)}"')
+
+        # Verify each fetch result now that the batch has completed
+        for index, action in enumerate(actions):
+            if action.operation == 'fetch':
+                self._verify_fetch_result(action, index)
 
     def test_cart_iv(self):
         """
@@ -209,19 +245,19 @@ class CartIvTwoNodeTest(CartTest):
 
         actions = [
             # Fetch, expect fail, no variable yet
-            {"operation": "fetch", "rank": 1, "key": (0, 42), "return_code": -1,
-             "expected_value": ""},
+            Action(operation="fetch", rank=1, key=(0, 42), return_code=-1,
+                   expected_value=""),
             # Add variable 0:42
-            {"operation": "update", "rank": 0, "key": (0, 42),
-             "value": "potato"},
+            Action(operation="update", rank=0, key=(0, 42),
+                   value="potato"),
             # Fetch the value and verify it
-            {"operation": "fetch", "rank": 0, "key": (0, 42), "return_code": 0,
-             "expected_value": "potato"},
+            Action(operation="fetch", rank=0, key=(0, 42), return_code=0,
+                   expected_value="potato"),
             # Invalidate the value
-            {"operation": "invalidate", "rank": 0, "key": (0, 42)},
+            Action(operation="invalidate", rank=0, key=(0, 42)),
             # Fetch the value again expecting failure
-            {"operation": "fetch", "rank": 0, "key": (0, 42), "return_code": -1,
-             "expected_value": ""},
+            Action(operation="fetch", rank=0, key=(0, 42), return_code=-1,
+                   expected_value=""),
         ]
 
         ###### Wait for servers to come up ######
@@ -232,11 +268,12 @@ class CartIvTwoNodeTest(CartTest):
 
         failed = False
 
-        clicmd = self.build_cmd(self.env, "test_clients")
+        # Tokenize the client command once; every launch below reuses it
+        client_argv = shlex.split(self.build_cmd(self.env, "test_clients"))
 
         ########## Launch Client Actions ##########
         try:
-            self._iv_test_actions(clicmd, actions)
+            self._iv_test_actions(client_argv, actions)
         except ValueError as exception:
             failed = True
             self.print("TEST FAILED: {}".format(exception))
@@ -248,11 +285,12 @@ class CartIvTwoNodeTest(CartTest):
 
         # Note: due to CART-408 issue, rank 0 needs to shutdown last
         # Request each server shut down gracefully
+        shutdown_argv = client_argv + ['-o', 'shutdown', '-r']
         for rank in reversed(list(range(1, int(srv_ppn) * num_servers))):
-            clicmdt = clicmd + " -o shutdown -r " + str(rank)
-            self.print("\nClient cmd : {}\n".format(clicmdt))
+            argv = shutdown_argv + [str(rank)]
+            self.print("\nClient cmd : {}\n".format(" ".join(argv)))
             try:
-                subprocess.call(shlex.split(clicmdt))
+                subprocess.call(argv)
             # pylint: disable=broad-except
             except Exception as e:
                 failed = True
@@ -261,10 +299,10 @@ class CartIvTwoNodeTest(CartTest):
         time.sleep(1)
 
         # Shutdown rank 0 separately
-        clicmd += " -o shutdown -r 0"
-        self.print("\nClient cmd : {}\n".format(clicmd))
+        argv = shutdown_argv + ['0']
+        self.print("\nClient cmd : {}\n".format(" ".join(argv)))
         try:
-            subprocess.call(shlex.split(clicmd))
+            subprocess.call(argv)
         # pylint: disable=broad-except
         except Exception as e:
             failed = True
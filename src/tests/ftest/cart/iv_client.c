@@ -55,6 +55,11 @@ print_usage(const char *err_msg)
 		"\t-m <value>     : Value as string, used to control timing to change group version\n"
 		"\t		 0  - change at time of call.\n"
 		"\t		 1  - change at end of iv_test_fetch.\n"
+		"\t-b <batch.txt> : Run a batch of operations from a file over a\n"
+		"\t		 single connection. Each line holds the same\n"
+		"\t		 options as a single invocation (without -b);\n"
+		"\t		 blank lines and lines starting with '#' are\n"
+		"\t		 skipped. Processing stops on the first error.\n"
 		"\n"
 		"Example usage: ./iv_client -o fetch -r 0 -k 2:9\n"
 		"\tThis will initiate fetch of key [2:9] from rank 0.\n"
@@ -491,6 +496,231 @@ enum op_type {
 	OP_NONE,
 };
 
+/**
+ * Validate the operation string and its argument combination.
+ *
+ * \return	the operation type, OP_NONE on error
+ */
+static enum op_type
+parse_op_type(const char *arg_op, const char *arg_key, const char *arg_value)
+{
+	enum op_type	cur_op;
+
+	if (strcmp(arg_op, "fetch") == 0) {
+		if (arg_value != NULL) {
+			print_usage("Value shouldn't be supplied for fetch");
+			return OP_NONE;
+		}
+		cur_op = OP_FETCH;
+	} else if (strcmp(arg_op, "update") == 0) {
+		cur_op = OP_UPDATE;
+
+		if (arg_value == NULL) {
+			print_usage("Value must be supplied for update");
+			return OP_NONE;
+		}
+	} else if (strcmp(arg_op, "invalidate") == 0) {
+		/* Avoid check patch warning */
+		cur_op = OP_INVALIDATE;
+	} else if (strcmp(arg_op, "shutdown") == 0) {
+		if (arg_key != NULL) {
+			print_usage("Key shouldn't be supplied for shutdown");
+			return OP_NONE;
+		}
+		cur_op = OP_SHUTDOWN;
+	} else if (strcmp(arg_op, "set_grp_version") == 0) {
+		if (arg_value == NULL) {
+			print_usage("Version must be supplied");
+			return OP_NONE;
+		}
+		cur_op = OP_SET_GRP_VERSION;
+	} else if (strcmp(arg_op, "get_grp_version") == 0) {
+		cur_op = OP_GET_GRP_VERSION;
+
+	} else {
+		print_usage("Unknown operation");
+		return OP_NONE;
+	}
+
+	if (arg_key == NULL && !((cur_op == OP_SHUTDOWN) ||
+				 (cur_op == OP_SET_GRP_VERSION) ||
+				 (cur_op == OP_GET_GRP_VERSION))) {
+		print_usage("Key (-k) is required for this operation");
+		return OP_NONE;
+	}
+
+	return cur_op;
+}
+
+/**
+ * Run a single already-validated operation against an attached server group.
+ *
+ * \return	0 on success, nonzero on error
+ */
+static int
+run_op(enum op_type cur_op, char *arg_rank, char *arg_key, char *arg_value,
+       bool arg_value_is_hex, char *arg_sync, char *arg_time, char *arg_log)
+{
+	struct iv_key_struct	 iv_key;
+	FILE			*log_file = stdout;
+
+	g_server_ep.ep_rank = atoi(arg_rank);
+
+	if (arg_key != NULL &&
+	    sscanf(arg_key, "%d:%d", &iv_key.rank, &iv_key.key_id) != 2) {
+		print_usage("Bad key format, should be rank:id");
+		return -1;
+	}
+
+	if (arg_log != NULL) {
+		/* Overwrite file, don't append */
+		log_file = fopen(arg_log, "w");
+		if (log_file == NULL) {
+			printf("Error opening file '%s': %s (%d)\n", arg_log,
+			       strerror(errno), errno);
+			return -1;
+		}
+	}
+
+	if (cur_op == OP_FETCH)
+		test_iv_fetch(&iv_key, log_file);
+	else if (cur_op == OP_UPDATE)
+		test_iv_update(&iv_key, arg_value, arg_value_is_hex, arg_sync);
+	else if (cur_op == OP_INVALIDATE)
+		test_iv_invalidate(&iv_key, arg_sync);
+	else if (cur_op == OP_SHUTDOWN)
+		test_iv_shutdown();
+	else if (cur_op == OP_SET_GRP_VERSION)
+		test_iv_set_grp_version(arg_value, arg_time);
+	else if (cur_op == OP_GET_GRP_VERSION)
+		test_iv_get_grp_version();
+
+	if (log_file != stdout)
+		fclose(log_file);
+
+	return 0;
+}
+
+#define MAX_BATCH_ARGS 32
+
+/**
+ * Tokenize one batch file line into an argv and run the requested operation.
+ * A line holds the same options as a single-shot invocation (without -b).
+ *
+ * \return	0 on success (or blank line), nonzero on error
+ */
+static int
+run_batch_line(char *line)
+{
+	char		*argv[MAX_BATCH_ARGS];
+	char		*token;
+	char		*saveptr = NULL;
+	char		*arg_rank = NULL;
+	char		*arg_op = NULL;
+	char		*arg_key = NULL;
+	char		*arg_value = NULL;
+	bool		 arg_value_is_hex = false;
+	char		*arg_sync = NULL;
+	char		*arg_log = NULL;
+	char		*arg_time = NULL;
+	enum op_type	 cur_op;
+	int		 argc = 1;
+	int		 c;
+
+	argv[0] = "iv_client";
+
+	for (token = strtok_r(line, " \t\r\n", &saveptr); token != NULL;
+	     token = strtok_r(NULL, " \t\r\n", &saveptr)) {
+		if (argc >= MAX_BATCH_ARGS) {
+			print_usage("Too many arguments on batch line");
+			return -1;
+		}
+		argv[argc++] = token;
+	}
+
+	/* Blank line */
+	if (argc == 1)
+		return 0;
+
+	/* 0 (not 1) makes glibc fully reinitialize its scanner state */
+	optind = 0;
+	while ((c = getopt(argc, argv, "k:o:r:s:v:x:l:m:")) != -1) {
+		switch (c) {
+		case 'r':
+			arg_rank = optarg;
+			break;
+		case 'o':
+			arg_op = optarg;
+			break;
+		case 'k':
+			arg_key = optarg;
+			break;
+		case 'v':
+			arg_value = optarg;
+			arg_value_is_hex = false;
+			break;
+		case 'x':
+			arg_value = optarg;
+			arg_value_is_hex = true;
+			break;
+		case 's':
+			arg_sync = optarg;
+			break;
+		case 'l':
+			arg_log = optarg;
+			break;
+		case 'm':
+			arg_time = optarg;
+			break;
+		default:
+			fprintf(stderr, "Unknown option %d\n", c);
+			print_usage("Bad option on batch line");
+			return -1;
+		}
+	}
+
+	if (arg_rank == NULL || arg_op == NULL) {
+		print_usage("Rank (-r) and Operation (-o) must be specified");
+		return -1;
+	}
+
+	cur_op = parse_op_type(arg_op, arg_key, arg_value);
+	if (cur_op == OP_NONE)
+		return -1;
+
+	return run_op(cur_op, arg_rank, arg_key, arg_value, arg_value_is_hex,
+		      arg_sync, arg_time, arg_log);
+}
+
+/**
+ * Run every operation listed in a batch file, stopping on the first error.
+ *
+ * \return	0 on success, nonzero on error
+ */
+static int
+run_batch_file(const char *batch_path)
+{
+	FILE	*batch_file;
+	char	 line[1024];
+	int	 rc = 0;
+
+	batch_file = fopen(batch_path, "r");
+	if (batch_file == NULL) {
+		printf("Error opening file '%s': %s (%d)\n", batch_path,
+		       strerror(errno), errno);
+		return -1;
+	}
+
+	while (rc == 0 && fgets(line, sizeof(line), batch_file) != NULL) {
+		if (line[0] == '#')
+			continue;
+		rc = run_batch_line(line);
+	}
+
+	fclose(batch_file);
+	return rc;
+}
+
 static void *
 progress_function(void *data)
 {
@@ -508,7 +738,6 @@ progress_function(void *data)
 
 int main(int argc, char **argv)
 {
-	struct iv_key_struct	 iv_key;
 	crt_group_t		*srv_grp;
 	char			*arg_rank = NULL;
 	char			*arg_op = NULL;
@@ -518,7 +747,7 @@ int main(int argc, char **argv)
 	char			*arg_sync = NULL;
 	char			*arg_log = NULL;
 	char			*arg_time = NULL;
-	FILE			*log_file = stdout;
+	char			*arg_batch = NULL;
 	enum op_type		 cur_op = OP_NONE;
 	int			 rc = 0;
 	pthread_t		 progress_thread;
@@ -529,7 +758,7 @@ int main(int argc, char **argv)
 	DBG_PRINT("\t***Client MAIN ****\n");
 	DBG_PRINT("\t*******************\n");
 
-	while ((c = getopt(argc, argv, "k:o:r:s:v:x:l:m:")) != -1) {
+	while ((c = getopt(argc, argv, "b:k:o:r:s:v:x:l:m:")) != -1) {
 		switch (c) {
 		case 'r':
 			arg_rank = optarg;
@@ -557,6 +786,9 @@ int main(int argc, char **argv)
 		case 'm':
 			arg_time = optarg;
 			break;
+		case 'b':
+			arg_batch = optarg;
+			break;
 		default:
 			fprintf(stderr, "Unknown option %d\n", c);
 			print_usage("Bad option");
@@ -564,62 +796,22 @@ int main(int argc, char **argv)
 		}
 	}
 
-	if (arg_rank == NULL || arg_op == NULL) {
-		print_usage("Rank (-r) and Operation (-o) must be specified");
-		return -1;
-	}
-
-	if (strcmp(arg_op, "fetch") == 0) {
-		if (arg_value != NULL) {
-			print_usage("Value shouldn't be supplied for fetch");
+	if (arg_batch != NULL) {
+		if (arg_op != NULL || arg_rank != NULL) {
+			print_usage("Batch (-b) takes operations from the "
+				    "file only");
 			return -1;
 		}
-		cur_op = OP_FETCH;
-	} else if (strcmp(arg_op, "update") == 0) {
-		cur_op = OP_UPDATE;
-
-		if (arg_value == NULL) {
-			print_usage("Value must be supplied for update");
-			return -1;
-		}
-	} else if (strcmp(arg_op, "invalidate") == 0) {
-		/* Avoid check patch warning */
-		cur_op = OP_INVALIDATE;
-	} else if (strcmp(arg_op, "shutdown") == 0) {
-		if (arg_key != NULL) {
-			print_usage("Key shouldn't be supplied for shutdown");
-			return -1;
-		}
-		cur_op = OP_SHUTDOWN;
-	} else if (strcmp(arg_op, "set_grp_version") == 0) {
-		if (arg_value == 0) {
-			print_usage("Version must be supplied");
+	} else {
+		if (arg_rank == NULL || arg_op == NULL) {
+			print_usage("Rank (-r) and Operation (-o) must be "
+				    "specified");
 			return -1;
 		}
-		cur_op = OP_SET_GRP_VERSION;
-	} else if (strcmp(arg_op, "get_grp_version") == 0) {
-		cur_op = OP_GET_GRP_VERSION;
-
-	} else {
-		print_usage("Unknown operation");
-		return -1;
-	}
-
-	if (arg_key == NULL && !((cur_op == OP_SHUTDOWN) ||
-				 (cur_op == OP_SET_GRP_VERSION) ||
-				 (cur_op == OP_GET_GRP_VERSION))) {
-		print_usage("Key (-k) is required for this operation");
-		return -1;
-	}
 
-	if (arg_log != NULL) {
-		/* Overwrite file, don't append */
-		log_file = fopen(arg_log, "w");
-		if (log_file == NULL) {
-			printf("Error opening file '%s': %s (%d)\n", arg_log,
-			       strerror(errno), errno);
+		cur_op = parse_op_type(arg_op, arg_key, arg_value);
+		if (cur_op == OP_NONE)
 			return -1;
-		}
 	}
 
 	/* rank, num_attach_retries, is_server, assert_on_error */
@@ -651,31 +843,13 @@ int main(int argc, char **argv)
 	assert(rc == 0);
 
 	g_server_ep.ep_grp = srv_grp;
-	g_server_ep.ep_rank = atoi(arg_rank);
 	g_server_ep.ep_tag = 0;
 
-	if (arg_key != NULL &&
-	    sscanf(arg_key, "%d:%d", &iv_key.rank, &iv_key.key_id) != 2) {
-		print_usage("Bad key format, should be rank:id");
-		return -1;
-	}
-
-	if (cur_op == OP_FETCH) {
-		test_iv_fetch(&iv_key, log_file);
-	} else if (cur_op == OP_UPDATE) {
-		test_iv_update(&iv_key, arg_value, arg_value_is_hex, arg_sync);
-	} else if (cur_op == OP_INVALIDATE) {
-		test_iv_invalidate(&iv_key, arg_sync);
-	} else if (cur_op == OP_SHUTDOWN) {
-		test_iv_shutdown();
-	} else if (cur_op == OP_SET_GRP_VERSION) {
-		test_iv_set_grp_version(arg_value, arg_time);
-	} else if (cur_op == OP_GET_GRP_VERSION) {
-		test_iv_get_grp_version();
-	} else {
-		print_usage("Unsupported operation");
-		return -1;
-	}
+	if (arg_batch != NULL)
+		rc = run_batch_file(arg_batch);
+	else
+		rc = run_op(cur_op, arg_rank, arg_key, arg_value,
+			    arg_value_is_hex, arg_sync, arg_time, arg_log);
 
 	crt_group_detach(srv_grp);
 
@@ -684,9 +858,6 @@ int main(int argc, char **argv)
 
 	DBG_PRINT("Exiting client\n");
 
-	if (log_file != stdout)
-		fclose(log_file);
-
 	crt_finalize();
 	return rc;
 }
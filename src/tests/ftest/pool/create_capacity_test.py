@@ -47,29 +47,28 @@ class PoolCreateTests(PoolTestBase):
         except ServerFailed as error:
             self.fail(error)
 
-        start = float(time.time())
+        start = time.monotonic()
         try:
             self.server_managers[0].system_start()
         except ServerFailed as error:
             self.fail(error)
 
-        duration = float(time.time()) - start
+        duration = time.monotonic() - start
         self.assertLessEqual(
             duration, 120,
             "DAOS not ready to accept requests with in 2 minutes")
 
         # Verify all the pools exists after the restart
-        detected_pools = [uuid.lower() for uuid in self.dmg.pool_list()]
-        missing_pools = []
-        for pool in self.pool:
-            pool_uuid = pool.uuid.lower()
-            if pool_uuid not in detected_pools:
-                missing_pools.append(pool_uuid)
+        detected_pools = {uuid.lower() for uuid in self.dmg.pool_list()}
+        created_pools = {pool.uuid.lower() for pool in self.pool}
+        missing_pools = sorted(created_pools - detected_pools)
         if missing_pools:
             self.fail(
                 "The following created pools were not detected in the pool "
                 "list after rebooting the servers:\n  [{}]: {}".format(
                     len(missing_pools), ", ".join(missing_pools)))
-        self.assertEqual(
-            len(self.pool), len(detected_pools),
-            "Additional pools detected after rebooting the servers")
+        extra_pools = sorted(detected_pools - created_pools)
+        if extra_pools:
+            self.fail(
+                "Additional pools detected after rebooting the servers:\n"
+                "  [{}]: {}".format(len(extra_pools), ", ".join(extra_pools)))